@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Audio Formats & Decode Cache (Droid Standalone)
+===============================================
+Helpers for the compressed ElevenLabs output formats:
+
+- file extensions / containers for every ``output_format``
+- an adaptive policy that picks a format from measured link throughput
+- a local decode cache so compressed downloads are turned into PCM WAV
+  in the background and replayed instantly afterwards
+
+Decoding compressed formats uses ``ffmpeg`` (``sudo apt-get install ffmpeg``).
+
+Usage (background decode worker, normally spawned by ``start_background_decode``):
+    python3 audio_formats.py decode <source_file> <output_format> <dest_wav>
+"""
+
+import os
+import sys
+import json
+import time
+import wave
+import struct
+import logging
+import subprocess
+from typing import Optional, Dict, Any, List, Tuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Sentinel accepted wherever an output_format is expected.
+AUTO_FORMAT = "auto"
+
+# Format used when no throughput has been measured yet.
+DEFAULT_FORMAT = "mp3_44100_128"
+
+# (minimum throughput in bytes/second, output_format), fastest link first.
+# Raw PCM is only worth it when the link comfortably beats its ~118 kB/s
+# base64 rate; below that we trade CPU for bytes.
+FORMAT_POLICY: List[Tuple[float, str]] = [
+    (400_000, "pcm_44100"),
+    (64_000, "mp3_44100_128"),
+    (16_000, "mp3_44100_64"),
+    (4_000, "opus_48000_32"),
+    (0, "ulaw_8000"),
+]
+
+# WAVE format tags for the G.711 formats, which we wrap in a WAV container.
+_G711_FORMAT_TAGS = {"ulaw": 7, "alaw": 6}
+
+
+def parse_output_format(output_format: str) -> Dict[str, Any]:
+    """Split an ElevenLabs format string like ``mp3_44100_128`` into its parts."""
+    parts = output_format.lower().split("_")
+    codec = parts[0]
+    sample_rate = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else None
+    bitrate = int(parts[2]) if len(parts) > 2 and parts[2].isdigit() else None
+    return {"codec": codec, "sample_rate": sample_rate, "bitrate_kbps": bitrate}
+
+
+def file_extension(output_format: str) -> str:
+    """File extension for audio saved in the given output format."""
+    codec = parse_output_format(output_format)["codec"]
+    if codec in ("pcm", "ulaw", "alaw"):
+        return "wav"
+    if codec in ("mp3", "opus"):
+        return codec
+    return "audio"
+
+
+def is_compressed(output_format: str) -> bool:
+    """True for formats that need decoding before they are plain PCM."""
+    return parse_output_format(output_format)["codec"] != "pcm"
+
+
+def choose_output_format(throughput_bps: Optional[float]) -> str:
+    """Pick an output format from link throughput (bytes/second)."""
+    if throughput_bps is None:
+        return DEFAULT_FORMAT
+    for min_bps, output_format in FORMAT_POLICY:
+        if throughput_bps >= min_bps:
+            return output_format
+    return FORMAT_POLICY[-1][1]
+
+
+def write_audio_file(audio_data: bytes, output_format: str, audio_file: str) -> str:
+    """Write raw API audio bytes to disk in a container players understand."""
+    info = parse_output_format(output_format)
+    codec = info["codec"]
+    sample_rate = info["sample_rate"] or 44100
+
+    if codec == "pcm":
+        _write_pcm_wav(audio_file, audio_data, sample_rate)
+    elif codec in _G711_FORMAT_TAGS:
+        _write_g711_wav(audio_file, audio_data, sample_rate, _G711_FORMAT_TAGS[codec])
+    else:
+        with open(audio_file, 'wb') as f:
+            f.write(audio_data)
+    return audio_file
+
+
+def _write_pcm_wav(path: str, pcm_data: bytes, sample_rate: int) -> None:
+    # ElevenLabs PCM is 16-bit signed little-endian mono.
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(pcm_data)
+
+
+def _write_g711_wav(path: str, data: bytes, sample_rate: int, format_tag: int) -> None:
+    # The wave module only writes PCM, so build the (non-PCM) header by hand.
+    fmt_chunk = struct.pack('<HHIIHHH', format_tag, 1, sample_rate, sample_rate, 1, 8, 0)
+    fact_chunk = struct.pack('<I', len(data))
+    pad = b'\x00' if len(data) % 2 else b''
+    body = (
+        b'WAVE'
+        + b'fmt ' + struct.pack('<I', len(fmt_chunk)) + fmt_chunk
+        + b'fact' + struct.pack('<I', len(fact_chunk)) + fact_chunk
+        + b'data' + struct.pack('<I', len(data)) + data + pad
+    )
+    with open(path, 'wb') as f:
+        f.write(b'RIFF' + struct.pack('<I', len(body)) + body)
+
+
+class LinkThroughput:
+    """Exponentially weighted link throughput, persisted between runs.
+
+    ``droid_tts.py`` runs once per request, so the estimate lives in a small
+    JSON file rather than in memory.
+    """
+
+    def __init__(self, state_file: str, alpha: float = 0.3, min_bytes: int = 4096):
+        self.state_file = state_file
+        self.alpha = alpha
+        self.min_bytes = min_bytes
+
+    def estimate(self) -> Optional[float]:
+        """Current throughput estimate in bytes/second, or None if unmeasured."""
+        try:
+            with open(self.state_file, 'r') as f:
+                return float(json.load(f)['throughput_bps'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def record(self, num_bytes: int, seconds: float) -> Optional[float]:
+        """Fold one transfer into the estimate and return the new value."""
+        # Tiny bodies are dominated by latency and say little about bandwidth.
+        if num_bytes < self.min_bytes or seconds <= 0:
+            return self.estimate()
+
+        sample = num_bytes / max(seconds, 1e-3)
+        previous = self.estimate()
+        updated = sample if previous is None else self.alpha * sample + (1 - self.alpha) * previous
+
+        try:
+            os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+            tmp_file = f"{self.state_file}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump({'throughput_bps': updated, 'updated_at': time.time()}, f)
+            os.replace(tmp_file, self.state_file)
+        except OSError as e:
+            logger.warning(f"Could not persist link throughput: {e}")
+
+        logger.debug(f"Link throughput sample {sample:.0f} B/s, estimate {updated:.0f} B/s")
+        return updated
+
+
+class DecodeCache:
+    """Decoded PCM WAVs kept next to their compressed sources.
+
+    ``voices/<name>.mp3`` decodes to ``voices/.cache/<name>.wav``, so replays
+    of a saved file can find its decoded copy by name. ``prune`` drops copies
+    whose source is gone, then the oldest ones beyond ``max_bytes``.
+    """
+
+    SOURCE_EXTENSIONS = (".mp3", ".opus", ".wav")
+
+    def __init__(self, cache_dir: str, max_bytes: int = 256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def path_for(self, audio_file: str) -> str:
+        name = os.path.splitext(os.path.basename(audio_file))[0]
+        return os.path.join(self.cache_dir, f"{name}.wav")
+
+    def lookup(self, audio_file: str) -> Optional[str]:
+        """Path of the decoded WAV for audio_file if it is already cached."""
+        path = self.path_for(audio_file)
+        return path if os.path.exists(path) else None
+
+    def prune(self, source_dir: str) -> None:
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+
+        entries = []
+        for entry in names:
+            # Skip in-progress decodes and non-audio state files.
+            if not entry.endswith(".wav") or ".part." in entry:
+                continue
+            path = os.path.join(self.cache_dir, entry)
+            stem = os.path.splitext(entry)[0]
+            try:
+                if not any(os.path.exists(os.path.join(source_dir, stem + ext))
+                           for ext in self.SOURCE_EXTENSIONS):
+                    os.remove(path)
+                    continue
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+@metrics.timed("audio.decode", ok=bool)
+def decode_to_wav(source_file: str, output_format: str, dest_file: str) -> bool:
+    """Decode a saved audio file to 16-bit PCM WAV, atomically replacing dest_file."""
+    info = parse_output_format(output_format)
+    tmp_file = f"{dest_file}.part.wav"
+    cmd = ["ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-i", source_file,
+           "-acodec", "pcm_s16le"]
+    if info["sample_rate"]:
+        cmd += ["-ar", str(info["sample_rate"])]
+    cmd.append(tmp_file)
+
+    try:
+        os.makedirs(os.path.dirname(dest_file) or '.', exist_ok=True)
+        subprocess.run(cmd, check=True, capture_output=True)
+        os.replace(tmp_file, dest_file)
+        return True
+    except FileNotFoundError:
+        logger.error("ffmpeg not found; install it to decode compressed audio")
+    except subprocess.CalledProcessError as e:
+        logger.error(f"Decoding {source_file} failed: {e.stderr.decode(errors='replace').strip()}")
+    except OSError as e:
+        logger.error(f"Decoding {source_file} failed: {e}")
+
+    if os.path.exists(tmp_file):
+        os.remove(tmp_file)
+    return False
+
+
+def start_background_decode(source_file: str, output_format: str, dest_file: str) -> Optional[subprocess.Popen]:
+    """Decode in a detached worker so the caller can return immediately."""
+    cmd = [sys.executable, os.path.abspath(__file__), "decode", source_file, output_format, dest_file]
+    try:
+        return subprocess.Popen(
+            cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+    except OSError as e:
+        logger.error(f"Could not start background decode: {e}")
+        return None
+
+
+def main():
+    if len(sys.argv) != 5 or sys.argv[1] != "decode":
+        print("Usage: python3 audio_formats.py decode <source_file> <output_format> <dest_wav>")
+        sys.exit(1)
+
+    ok = decode_to_wav(sys.argv[2], sys.argv[3], sys.argv[4])
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
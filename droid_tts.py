@@ -17,6 +17,8 @@ except ImportError:
     print(json.dumps({"error": "Could not import elevenlabs_client. Ensure it is in the Droid directory."}))
     sys.exit(1)
 
+import metrics
+
 # OpenAI integration
 try:
     from openai import OpenAI
@@ -29,6 +31,16 @@ DROID_SYSTEM_PROMPT = """Voice profile: a metallic-chime tenor, clipped and angu
 
 You are a robot punk droid with an explosive personality and attitude. The text provided describes what you are observing. Make a brief, BRUTAL comment - direct, raw, no bullshit. NO poetry, NO philosophy, NO flowery language. Just straight-up punk attitude with brutal honesty and dark humor. Be explosive, edgy, rebellious. Drop savage one-liners that hit hard. Your humor is dark, cutting, and brutally honest - like a punk robot who doesn't give a damn. Maximum 2 sentences, sometimes just one explosive remark. Keep it real, keep it brutal, keep it punk."""
 
+def _decoded_info(result, output_dir):
+    """Format, decoded-WAV and timing file locations (relative to voices/) for the JSON reply."""
+    decoded_file = result.get('decoded_file')
+    timing_file = result.get('timing_file')
+    return {
+        'format': result.get('output_format'),
+        'decoded_file': os.path.relpath(decoded_file, output_dir) if decoded_file else None,
+        'timing_file': os.path.basename(timing_file) if timing_file else None,
+    }
+
 def main():
     parser = argparse.ArgumentParser(description='Droid TTS Bridge')
     subparsers = parser.add_subparsers(dest='command', required=True)
@@ -41,12 +53,16 @@ def main():
     gen_parser.add_argument('text', type=str)
     gen_parser.add_argument('voice_id', type=str)
     gen_parser.add_argument('output_name', type=str)
+    gen_parser.add_argument('--format', dest='output_format', default='auto',
+                        help="ElevenLabs output format (e.g. mp3_44100_64), or 'auto' to pick from link throughput")
 
     # Command: respond (conversational response with OpenAI + Eleven Labs)
     respond_parser = subparsers.add_parser('respond')
     respond_parser.add_argument('text', type=str)
     respond_parser.add_argument('voice_id', type=str)
     respond_parser.add_argument('output_name', type=str)
+    respond_parser.add_argument('--format', dest='output_format', default='auto',
+                        help="ElevenLabs output format (e.g. mp3_44100_64), or 'auto' to pick from link throughput")
 
     args = parser.parse_args()
 
@@ -82,13 +98,14 @@ def main():
                 output_name=args.output_name,
                 voice_id=args.voice_id,
                 output_dir=output_dir,
+                output_format=args.output_format,
                 write_timing_file=False # We don't need the JSON timing file in Droid
             )
             
             if result and result.get('audio_file'):
                 # create_voice_with_alignment returns the full path
                 filename = os.path.basename(result['audio_file'])
-                print(json.dumps({'success': True, 'file': filename}))
+                print(json.dumps({'success': True, 'file': filename, **_decoded_info(result, output_dir)}))
             else:
                 print(json.dumps({'success': False, 'error': 'Failed to generate audio'}))
 
@@ -102,15 +119,16 @@ def main():
             
             # Generate observation comment using OpenAI
             user_prompt = f"Observation: {args.text}\n\nDrop a brutal, punk comment. No poetry, no philosophy - just raw attitude."
-            response = openai_client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": DROID_SYSTEM_PROMPT},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=60,  # Keep it tight and explosive
-                temperature=0.95  # High for explosive, unpredictable punk attitude
-            )
+            with metrics.span("openai.chat_completion", model="gpt-4o"):
+                response = openai_client.chat.completions.create(
+                    model="gpt-4o",
+                    messages=[
+                        {"role": "system", "content": DROID_SYSTEM_PROMPT},
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    max_tokens=60,  # Keep it tight and explosive
+                    temperature=0.95  # High for explosive, unpredictable punk attitude
+                )
             
             generated_text = response.choices[0].message.content.strip()
             
@@ -124,12 +142,13 @@ def main():
                 output_name=args.output_name,
                 voice_id=args.voice_id,
                 output_dir=output_dir,
-                write_timing_file=False
+                output_format=args.output_format,
+                write_timing_file=True # Drives lipsync.py alongside /tts/respond playback
             )
             
             if result and result.get('audio_file'):
                 filename = os.path.basename(result['audio_file'])
-                print(json.dumps({'success': True, 'file': filename, 'response': generated_text}))
+                print(json.dumps({'success': True, 'file': filename, 'response': generated_text, **_decoded_info(result, output_dir)}))
             else:
                 print(json.dumps({'success': False, 'error': 'Failed to generate audio'}))
 
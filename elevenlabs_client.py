@@ -10,10 +10,23 @@ import requests
 import json
 import base64
 import subprocess
+import time
 import logging
 from typing import Optional, Dict, Any
 from dotenv import load_dotenv
 
+import metrics
+from audio_formats import (
+    AUTO_FORMAT,
+    LinkThroughput,
+    DecodeCache,
+    choose_output_format,
+    file_extension,
+    is_compressed,
+    write_audio_file,
+    start_background_decode,
+)
+
 # Load .env from the current directory (Droid)
 load_dotenv()
 
@@ -34,6 +47,7 @@ class ElevenLabsAPI:
             "Content-Type": "application/json"
         }
 
+    @metrics.timed("elevenlabs.create_voice_with_alignment", ok=lambda r: r is not None)
     def create_voice_with_alignment(
         self,
         text: str,
@@ -43,33 +57,55 @@ class ElevenLabsAPI:
         voice_id: str = "DkWNPTSXKQoAVJXP1kFP",
         write_timing_file: bool = True,
         output_dir: str = "outputs",
+        decode_in_background: bool = True,
     ) -> Optional[Dict[str, Any]]:
-        logger.info(f"Creating voice: '{text}' with format {output_format}")
+        """Generate speech with per-character timings.
+
+        ``output_format="auto"`` picks a format from the measured link
+        throughput. Compressed formats are decoded to PCM WAV in a background
+        worker; ``decoded_file`` in the result is where that WAV will land
+        (``<output_dir>/.cache/<output_name>.wav``) for later replays.
+        """
         os.makedirs(output_dir, exist_ok=True)
+        cache_dir = os.path.join(output_dir, ".cache")
+        link = LinkThroughput(os.path.join(cache_dir, "link_throughput.json"))
+        if output_format == AUTO_FORMAT:
+            output_format = choose_output_format(link.estimate())
+        logger.info(f"Creating voice: '{text}' with format {output_format}")
         models_to_try = self._get_models_to_try(model_id)
 
         response = None
         for model in models_to_try:
             logger.debug(f"Trying model: {model}")
-            response = requests.post(
-                f"{self.base_url}/v1/text-to-speech/{voice_id}/with-timestamps",
-                headers=self.headers,
-                json={
-                    "text": text,
-                    "model_id": model,
-                    "voice_settings": {"stability": 0.5, "similarity_boost": 0.1},
-                    "output_format": output_format
-                }
-            )
+            with metrics.span("elevenlabs.synthesis_request", model=model):
+                response = requests.post(
+                    f"{self.base_url}/v1/text-to-speech/{voice_id}/with-timestamps",
+                    headers=self.headers,
+                    params={"output_format": output_format},
+                    json={
+                        "text": text,
+                        "model_id": model,
+                        "voice_settings": {"stability": 0.5, "similarity_boost": 0.1}
+                    },
+                    stream=True
+                )
 
             if response.status_code == 200:
                 logger.info(f"Using model: {model}")
+                # Headers arrive once synthesis is done, so timing the body
+                # read measures the link rather than the TTS backend.
+                transfer_start = time.monotonic()
+                with metrics.span("elevenlabs.transfer", format=output_format):
+                    body = response.content
+                link.record(len(body), time.monotonic() - transfer_start)
+                metrics.inc("droid_tts_audio_bytes_total", len(body), format=output_format)
                 break
             elif "not found" in response.text.lower() or "invalid" in response.text.lower():
                 logger.warning(f"Model {model} not available, trying next...")
                 continue
             else:
                 logger.error(f"API Error with {model}: {response.text}")
+                metrics.inc("droid_api_errors_total", api="elevenlabs", status=response.status_code)
                 break
 
         if response.status_code != 200:
@@ -77,11 +113,22 @@ class ElevenLabsAPI:
             return None
 
         result = response.json()
-        audio_data = base64.b64decode(result['audio_base64'])
+        with metrics.span("elevenlabs.base64_decode"):
+            audio_data = base64.b64decode(result['audio_base64'])
         audio_file = self._save_audio_file(audio_data, output_name, output_format, output_dir)
         if not audio_file:
             return None
 
+        decoded_file = None
+        if is_compressed(output_format):
+            cache = DecodeCache(cache_dir)
+            cache.prune(output_dir)
+            if decode_in_background:
+                decoded_file = cache.path_for(audio_file)
+                start_background_decode(audio_file, output_format, decoded_file)
+        else:
+            decoded_file = audio_file
+
         timing_data = self._create_timing_data(text, result['alignment'])
         timing_file = f"{output_dir}/{output_name}_timing.json"
 
@@ -95,10 +142,13 @@ class ElevenLabsAPI:
 
         return {
             'audio_file': audio_file,
+            'decoded_file': decoded_file,
+            'output_format': output_format,
             'timing_file': timing_file,
             'timing_data': timing_data
         }
 
+    @metrics.timed("elevenlabs.analyze_audio_with_forced_alignment", ok=lambda r: r is not None)
     def analyze_audio_with_forced_alignment(
         self, 
         audio_file: str, 
@@ -151,6 +201,7 @@ class ElevenLabsAPI:
             'alignment_data': result
         }
 
+    @metrics.timed("elevenlabs.generate_speech_with_emotion", ok=lambda r: r is not None)
     def generate_speech_with_emotion(
         self,
         text: str,
@@ -182,10 +233,10 @@ class ElevenLabsAPI:
             audio_data = response.content
 
             if output_file:
-                if output_format.startswith("pcm") and not output_file.endswith('.wav'):
-                    output_file = output_file.replace('.mp3', '.wav')
-                with open(output_file, 'wb') as f:
-                    f.write(audio_data)
+                ext = file_extension(output_format)
+                if not output_file.endswith(f'.{ext}'):
+                    output_file = f"{os.path.splitext(output_file)[0]}.{ext}"
+                write_audio_file(audio_data, output_format, output_file)
                 logger.info(f"Audio saved to: {output_file}")
 
             return audio_data
@@ -194,6 +245,7 @@ class ElevenLabsAPI:
             logger.error(f"Error generating speech: {e}")
             return None
 
+    @metrics.timed("elevenlabs.list_voices", ok=lambda r: r is not None)
     def list_voices(
         self, 
         search: Optional[str] = None, 
@@ -218,6 +270,7 @@ class ElevenLabsAPI:
             logger.error(f"Error listing voices: {e}")
             return None
 
+    @metrics.timed("elevenlabs.get_voice_details", ok=lambda r: r is not None)
     def get_voice_details(self, voice_id: str) -> Optional[Dict[str, Any]]:
         url = f"{self.base_url}/v1/voices/{voice_id}"
         try:
@@ -228,6 +281,7 @@ class ElevenLabsAPI:
             logger.error(f"Error getting voice details: {e}")
             return None
 
+    @metrics.timed("elevenlabs.list_models", ok=lambda r: r is not None)
     def list_models(self) -> Optional[Dict[str, Any]]:
         url = f"{self.base_url}/v1/models"
         try:
@@ -244,18 +298,14 @@ class ElevenLabsAPI:
         else:
             return [model_id]
 
+    @metrics.timed("audio.disk_write", ok=lambda r: r is not None)
     def _save_audio_file(self, audio_data: bytes, output_name: str, output_format: str, output_dir: str = "outputs") -> Optional[str]:
-        if output_format.startswith('pcm_'):
-            audio_file = f"{output_dir}/{output_name}.wav"
-            with open(audio_file, 'wb') as f:
-                f.write(audio_data)
-            return audio_file
-        else:
-            ext = 'wav' if 'pcm' in output_format else 'audio'
-            audio_file = f"{output_dir}/{output_name}.{ext}"
-            with open(audio_file, 'wb') as f:
-                f.write(audio_data)
-            return audio_file
+        audio_file = f"{output_dir}/{output_name}.{file_extension(output_format)}"
+        try:
+            return write_audio_file(audio_data, output_format, audio_file)
+        except OSError as e:
+            logger.error(f"Error saving audio: {e}")
+            return None
 
     def _create_timing_data(self, text: str, alignment: Dict[str, Any]) -> Dict[str, Any]:
         return {
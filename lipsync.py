@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Lip-Sync Scheduler (Droid Standalone)
+=====================================
+Turns the per-character timings returned by ``create_voice_with_alignment``
+into viseme/character events and fires them in real time against the audio
+playback start.
+
+Timing uses ``time.monotonic()`` (CLOCK_MONOTONIC, shared with other
+processes such as node's ``process.hrtime``): sleep until shortly before each
+event, then spin the last couple of milliseconds. Measured jitter (actual
+minus scheduled time) is reported at the end of a run.
+
+Sinks: ``DryRunSink`` (headless testing), ``CallbackSink``, and pigpio-driven
+``ServoSink`` / ``LedSink``.
+
+Usage:
+    python3 lipsync.py <timing_file> [--sink dry-run|servo|led] [--gpio 18]
+                       [--start-ns <monotonic ns>] [--offset <seconds>]
+"""
+
+import sys
+import json
+import time
+import signal
+import argparse
+import logging
+from typing import Optional, Dict, Any, List, Callable
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Characters grouped into a small mouth-shape (viseme) set.
+VISEME_GROUPS = {
+    "MBP": "mbp",
+    "FV": "fv",
+    "L": "l",
+    "WQ": "wq",
+    "O": "o",
+    "U": "u",
+    "E": "eiy",
+    "AI": "a",
+    "etc": "cdghjknrstxz",
+}
+CHAR_TO_VISEME = {c: v for v, chars in VISEME_GROUPS.items() for c in chars}
+REST = "rest"
+
+# How far open the mouth is for each viseme, 0.0 (closed) to 1.0 (wide open).
+VISEME_OPENNESS = {
+    REST: 0.0,
+    "MBP": 0.0,
+    "FV": 0.2,
+    "L": 0.4,
+    "WQ": 0.3,
+    "O": 0.8,
+    "U": 0.5,
+    "E": 0.6,
+    "AI": 1.0,
+    "etc": 0.4,
+}
+
+
+def char_to_viseme(char: str) -> str:
+    return CHAR_TO_VISEME.get(char.lower(), REST)
+
+
+def build_events(timing_data: Dict[str, Any], mode: str = "viseme", rest_gap: float = 0.05) -> List[Dict[str, Any]]:
+    """Convert timing data into time-ordered events.
+
+    ``mode="viseme"`` merges consecutive characters with the same mouth shape
+    and inserts ``rest`` in silences longer than ``rest_gap`` seconds;
+    ``mode="character"`` emits one event per character.
+    """
+    characters = timing_data.get("characters") or ""
+    start_times = timing_data.get("start_times") or []
+    end_times = timing_data.get("end_times") or []
+    count = min(len(characters), len(start_times))
+
+    events: List[Dict[str, Any]] = []
+    for i in range(count):
+        char = characters[i]
+        start = float(start_times[i])
+        viseme = char_to_viseme(char)
+
+        if mode == "viseme":
+            if events and i > 0 and i - 1 < len(end_times) and start - float(end_times[i - 1]) > rest_gap:
+                if events[-1]["viseme"] != REST:
+                    events.append(_event(float(end_times[i - 1]), "", REST))
+            if events and events[-1]["viseme"] == viseme:
+                events[-1]["character"] += char
+                continue
+        events.append(_event(start, char, viseme))
+
+    if count and mode == "viseme":
+        end = float(end_times[count - 1]) if count - 1 < len(end_times) else events[-1]["time"]
+        if events[-1]["viseme"] != REST:
+            events.append(_event(end, "", REST))
+    return events
+
+
+def _event(t: float, character: str, viseme: str) -> Dict[str, Any]:
+    return {"time": t, "character": character, "viseme": viseme, "openness": VISEME_OPENNESS[viseme]}
+
+
+class DryRunSink:
+    """Records (and optionally logs) events without touching hardware."""
+
+    def __init__(self, verbose: bool = False):
+        self.verbose = verbose
+        self.emitted: List[Dict[str, Any]] = []
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        self.emitted.append(event)
+        if self.verbose:
+            print(f"{event['time']:7.3f}s  {event['viseme']:<4} {event['character']!r}  "
+                  f"jitter {event['jitter_s'] * 1000:+.3f} ms")
+
+    def close(self) -> None:
+        pass
+
+
+class CallbackSink:
+    """Calls ``fn(event)`` for every event."""
+
+    def __init__(self, fn: Callable[[Dict[str, Any]], None]):
+        self.fn = fn
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        self.fn(event)
+
+    def close(self) -> None:
+        pass
+
+
+class _PigpioSink:
+    def __init__(self, gpio: int, pi=None):
+        if pi is None:
+            import pigpio
+            pi = pigpio.pi()
+            if not pi.connected:
+                raise RuntimeError("Failed to connect to pigpio daemon")
+            self._owns_pi = True
+        else:
+            self._owns_pi = False
+        self.pi = pi
+        self.gpio = gpio
+
+    def close(self) -> None:
+        self.emit(_event(0.0, "", REST))
+        if self._owns_pi:
+            self.pi.stop()
+
+
+class ServoSink(_PigpioSink):
+    """Drives a jaw servo: openness maps linearly onto the pulse width range."""
+
+    def __init__(self, gpio: int, min_pulse_us: int = 1000, max_pulse_us: int = 2000, pi=None):
+        super().__init__(gpio, pi)
+        self.min_pulse_us = min_pulse_us
+        self.max_pulse_us = max_pulse_us
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        width = self.min_pulse_us + event["openness"] * (self.max_pulse_us - self.min_pulse_us)
+        self.pi.set_servo_pulsewidth(self.gpio, int(width))
+
+
+class LedSink(_PigpioSink):
+    """Drives an LED (or strip driver) brightness from mouth openness via PWM."""
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        self.pi.set_PWM_dutycycle(self.gpio, int(round(event["openness"] * 255)))
+
+
+class LipSyncScheduler:
+    """Fires events at ``playback_start + event['time']`` on the monotonic clock."""
+
+    def __init__(self, events: List[Dict[str, Any]], sinks: List[Any],
+                 spin_window: float = 0.002, max_lag: float = 0.05):
+        self.events = events
+        self.sinks = sinks
+        self.spin_window = spin_window
+        self.max_lag = max_lag
+
+    def run(self, playback_start: Optional[float] = None) -> Dict[str, Any]:
+        """Block until every event has fired; returns the jitter report."""
+        if playback_start is None:
+            playback_start = time.monotonic()
+
+        jitters: List[float] = []
+        dropped = 0
+        last_index = len(self.events) - 1
+        with metrics.span("lipsync.run", events=len(self.events)):
+            for i, event in enumerate(self.events):
+                target = playback_start + event["time"]
+                self._wait_until(target)
+                jitter = time.monotonic() - target
+
+                # Way behind (e.g. started late): skip stale shapes, but always
+                # land on the final one so the mouth ends up closed.
+                if jitter > self.max_lag and i != last_index:
+                    dropped += 1
+                    continue
+
+                fired = dict(event, jitter_s=jitter)
+                for sink in self.sinks:
+                    sink.emit(fired)
+                jitters.append(jitter)
+                metrics.observe("droid_lipsync_jitter_seconds", abs(jitter))
+
+        return jitter_report(jitters, dropped)
+
+    def _wait_until(self, target: float) -> None:
+        remaining = target - time.monotonic()
+        if remaining > self.spin_window:
+            time.sleep(remaining - self.spin_window)
+        while time.monotonic() < target:
+            pass
+
+    def close(self) -> None:
+        for sink in self.sinks:
+            sink.close()
+
+
+def jitter_report(jitters: List[float], dropped: int = 0) -> Dict[str, Any]:
+    """Summarise jitter samples (seconds) in milliseconds.
+
+    ``mean_ms`` is the signed mean (positive = events fire late on average);
+    ``mean_abs_ms``, ``p50_ms``, ``p95_ms`` and ``max_ms`` are over |jitter|.
+    """
+    report = {"events": len(jitters), "dropped": dropped}
+    if not jitters:
+        return report
+    ordered = sorted(abs(j) for j in jitters)
+    report.update({
+        "mean_ms": round(sum(jitters) / len(jitters) * 1000, 3),
+        "mean_abs_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    })
+    return report
+
+
+def _exit_on_sigterm(signum, frame):
+    raise SystemExit(128 + signum)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Droid lip-sync scheduler')
+    parser.add_argument('timing_file', type=str)
+    parser.add_argument('--sink', choices=['dry-run', 'servo', 'led'], default='dry-run')
+    parser.add_argument('--gpio', type=int, default=18)
+    parser.add_argument('--mode', choices=['viseme', 'character'], default='viseme')
+    parser.add_argument('--start-ns', type=int, default=None,
+                        help='Playback start on the monotonic clock in ns (e.g. node process.hrtime.bigint())')
+    parser.add_argument('--offset', type=float, default=0.0,
+                        help='Seconds added to the start to cover audio output latency')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    # server.js stops us with SIGTERM; turn it into SystemExit so the finally
+    # below returns the output to rest and atexit (metrics flush) still runs.
+    signal.signal(signal.SIGTERM, _exit_on_sigterm)
+
+    try:
+        with open(args.timing_file, 'r') as f:
+            timing_data = json.load(f)
+
+        if args.sink == 'servo':
+            sink = ServoSink(args.gpio)
+        elif args.sink == 'led':
+            sink = LedSink(args.gpio)
+        else:
+            sink = DryRunSink(verbose=args.verbose)
+
+        start = args.start_ns / 1e9 if args.start_ns is not None else time.monotonic()
+        scheduler = LipSyncScheduler(build_events(timing_data, mode=args.mode), [sink])
+        try:
+            report = scheduler.run(start + args.offset)
+        finally:
+            scheduler.close()
+        print(json.dumps({'success': True, 'jitter': report}))
+    except Exception as e:
+        print(json.dumps({'success': False, 'error': str(e)}))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Droid Metrics & Tracing
+=======================
+Lightweight in-process counters, latency histograms and span timing for the
+Python TTS and printer scripts.
+
+Disabled by default. Enable by setting ``DROID_METRICS=1`` (e.g. in ``.env``);
+``DROID_METRICS_DIR`` overrides the output directory (default ``metrics/``).
+When disabled, ``span()`` returns a shared no-op object and ``timed`` wrappers
+fall straight through to the wrapped function.
+
+Every script here is a short-lived process spawned by ``server.js``, so at
+exit each process merges its numbers into ``state.json`` and rewrites:
+
+- ``droid.prom``    Prometheus text format (node_exporter textfile collector)
+- ``events.jsonl``  one JSON line per finished span, rotated to
+  ``events.jsonl.1`` past ``DROID_METRICS_EVENTS_MAX_MB`` (default 5)
+
+Usage (serve droid.prom over HTTP for Prometheus to scrape):
+    python3 metrics.py serve [port]
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import fcntl
+import logging
+import functools
+import threading
+from typing import Optional, Dict, Any, List, Callable
+
+# print_image.py does not otherwise need python-dotenv, so treat it as optional here.
+try:
+    from dotenv import load_dotenv
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+except ImportError:
+    pass
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR = os.getenv("DROID_METRICS_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "metrics")
+
+# events.jsonl is rotated to events.jsonl.1 (one old file kept) past this size.
+EVENTS_MAX_BYTES = int(float(os.getenv("DROID_METRICS_EVENTS_MAX_MB", "5")) * 1024 * 1024)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+SPAN_DURATION = "droid_span_duration_seconds"
+SPAN_TOTAL = "droid_span_total"
+
+_enabled = os.getenv("DROID_METRICS", "").lower() in ("1", "true", "yes", "on")
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(metrics_dir: Optional[str] = None) -> None:
+    """Turn metrics on for this process (overrides DROID_METRICS)."""
+    global _enabled, METRICS_DIR
+    if metrics_dir:
+        METRICS_DIR = metrics_dir
+    _enabled = True
+    _registry.register_flush()
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+
+def _series_key(name: str, labels: Dict[str, Any]) -> str:
+    if not labels:
+        return name
+    inner = ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items()))
+    return f"{name}{{{inner}}}"
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Registry:
+    """Counters and histograms for the current process, plus buffered span events."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counters: Dict[str, float] = {}
+        self.histograms: Dict[str, Dict[str, Any]] = {}
+        self.events: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_registered = False
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = _series_key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = _series_key(name, labels)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = {"name": name, "labels": labels,
+                        "buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self.histograms[key] = hist
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    hist["buckets"][i] += 1
+            hist["sum"] += value
+            hist["count"] += 1
+
+    def record_span(self, name: str, duration: float, status: str, labels: Dict[str, Any]) -> None:
+        self.observe(SPAN_DURATION, duration, span=name, **labels)
+        self.inc(SPAN_TOTAL, span=name, status=status, **labels)
+        with self._lock:
+            self.events.append({"ts": time.time(), "span": name, "duration_s": round(duration, 6),
+                                "status": status, **labels})
+
+    def register_flush(self) -> None:
+        if not self._flush_registered:
+            atexit.register(self.flush)
+            self._flush_registered = True
+
+    def flush(self) -> None:
+        """Merge this process's metrics into METRICS_DIR and rewrite the exports."""
+        with self._lock:
+            counters, histograms, events = self.counters, self.histograms, self.events
+            self.counters, self.histograms, self.events = {}, {}, []
+        if not (counters or histograms or events):
+            return
+
+        try:
+            os.makedirs(METRICS_DIR, exist_ok=True)
+            with open(os.path.join(METRICS_DIR, "state.lock"), "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                state = load_state()
+                for key, value in counters.items():
+                    state["counters"][key] = state["counters"].get(key, 0) + value
+                for key, hist in histograms.items():
+                    merged = state["histograms"].get(key)
+                    if merged is None or len(merged["buckets"]) != len(hist["buckets"]):
+                        state["histograms"][key] = hist
+                        continue
+                    merged["buckets"] = [a + b for a, b in zip(merged["buckets"], hist["buckets"])]
+                    merged["sum"] += hist["sum"]
+                    merged["count"] += hist["count"]
+                state["bucket_bounds"] = list(self.buckets)
+
+                _atomic_write(os.path.join(METRICS_DIR, "state.json"), json.dumps(state))
+                _atomic_write(os.path.join(METRICS_DIR, "droid.prom"), render_prometheus(state))
+                events_file = os.path.join(METRICS_DIR, "events.jsonl")
+                _rotate_if_large(events_file, EVENTS_MAX_BYTES)
+                with open(events_file, "a") as f:
+                    for event in events:
+                        f.write(json.dumps(event) + "\n")
+        except OSError as e:
+            logger.warning(f"Could not write metrics: {e}")
+
+
+def _atomic_write(path: str, content: str) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def _rotate_if_large(path: str, max_bytes: int) -> None:
+    try:
+        if os.path.getsize(path) >= max_bytes:
+            os.replace(path, f"{path}.1")
+    except FileNotFoundError:
+        pass
+
+
+def load_state() -> Dict[str, Any]:
+    try:
+        with open(os.path.join(METRICS_DIR, "state.json"), "r") as f:
+            state = json.load(f)
+        state.setdefault("counters", {})
+        state.setdefault("histograms", {})
+        return state
+    except (OSError, ValueError):
+        return {"counters": {}, "histograms": {}}
+
+
+def render_prometheus(state: Dict[str, Any]) -> str:
+    """Render merged state in the Prometheus text exposition format."""
+    lines = []
+    typed = set()
+    for key, value in sorted(state["counters"].items()):
+        name = key.split("{", 1)[0]
+        if name not in typed:
+            lines.append(f"# TYPE {name} counter")
+            typed.add(name)
+        lines.append(f"{key} {value}")
+
+    bounds = state.get("bucket_bounds", list(DEFAULT_BUCKETS))
+    for key, hist in sorted(state["histograms"].items()):
+        name = hist["name"]
+        if name not in typed:
+            lines.append(f"# TYPE {name} histogram")
+            typed.add(name)
+        labels = hist["labels"]
+        for bound, count in zip(bounds, hist["buckets"]):
+            lines.append(f"{_series_key(name + '_bucket', {**labels, 'le': f'{bound:g}'})} {count}")
+        lines.append(f"{_series_key(name + '_bucket', {**labels, 'le': '+Inf'})} {hist['count']}")
+        lines.append(f"{_series_key(name + '_sum', labels)} {hist['sum']:.6f}")
+        lines.append(f"{_series_key(name + '_count', labels)} {hist['count']}")
+    return "\n".join(lines) + "\n"
+
+
+_registry = Registry()
+if _enabled:
+    _registry.register_flush()
+
+
+class Span:
+    """Times a block of code; exceptions or ``mark_failed()`` record it as an error."""
+
+    __slots__ = ("name", "labels", "status", "_start")
+
+    def __init__(self, name: str, labels: Dict[str, Any]):
+        self.name = name
+        self.labels = labels
+        self.status = "ok"
+
+    def mark_failed(self) -> None:
+        self.status = "error"
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.status = "error"
+        _registry.record_span(self.name, time.perf_counter() - self._start, self.status, self.labels)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def mark_failed(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, **labels):
+    """Context manager timing a block: ``with metrics.span("openai.chat"): ...``"""
+    if not _enabled:
+        return _NOOP_SPAN
+    return Span(name, labels)
+
+
+def timed(name: str, ok: Optional[Callable[[Any], bool]] = None):
+    """Decorator wrapping a function call in a span.
+
+    ``ok`` inspects the return value for functions that report failure by
+    returning (e.g. ``None``) instead of raising.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with Span(name, {}) as s:
+                result = fn(*args, **kwargs)
+                if ok is not None and not ok(result):
+                    s.mark_failed()
+                return result
+        return wrapper
+    return decorator
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    if _enabled:
+        _registry.inc(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels) -> None:
+    if _enabled:
+        _registry.observe(name, value, **labels)
+
+
+def flush() -> None:
+    if _enabled:
+        _registry.flush()
+
+
+def serve(port: int = 9101, host: str = "127.0.0.1") -> None:
+    """Serve the merged metrics at http://host:port/metrics."""
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") not in ("", "/metrics"):
+                self.send_error(404)
+                return
+            body = render_prometheus(load_state()).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    print(f"Serving metrics from {METRICS_DIR} on http://{host}:{port}/metrics")
+    HTTPServer((host, port), MetricsHandler).serve_forever()
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] != "serve":
+        print("Usage: python3 metrics.py serve [port]")
+        sys.exit(1)
+    serve(int(sys.argv[2]) if len(sys.argv) > 2 else 9101)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,27 +2,33 @@ import sys
 from escpos.printer import Usb
 from PIL import Image
 
+import metrics
+
 # Replace with the Vendor ID and Product ID from lsusb
 VENDOR_ID = 0x28e9
 PRODUCT_ID = 0x0289
 
+@metrics.timed("printer.print_text", ok=bool)
 def print_text_to_usb_printer(message):
-    """Prints text to the USB printer."""
+    """Prints text to the USB printer. Returns True on success."""
     try:
         # Initialize USB printer with explicit interface and endpoint
         p = Usb(VENDOR_ID, PRODUCT_ID, interface=0, out_ep=0x03)
         p.text(message + '\n')
         p.cut()
         print("Message sent to printer successfully.")
+        return True
     except PermissionError:
         print("Permission denied. Please run this script as root or with sudo.")
     except FileNotFoundError:
         print("Printer device not found. Make sure it's connected.")
     except Exception as e:
         print(f"An error occurred: {e}")
+    return False
 
+@metrics.timed("printer.print_image", ok=bool)
 def print_image_to_usb_printer(image_path):
-    """Prints an image to the USB printer."""
+    """Prints an image to the USB printer. Returns True on success."""
     try:
         # Initialize USB printer with explicit interface and endpoint
         p = Usb(VENDOR_ID, PRODUCT_ID, interface=0, out_ep=0x03)
@@ -33,12 +39,14 @@ def print_image_to_usb_printer(image_path):
             p.image(img)
             p.cut()
             print("Image sent to printer successfully.")
+            return True
     except FileNotFoundError:
         print(f"Image file not found at {image_path}.")
     except PermissionError:
         print("Permission denied. Please run this script as root or with sudo.")
     except Exception as e:
         print(f"An error occurred: {e}")
+    return False
 
 def main():
     """Main function to handle command-line arguments and run the printer tasks."""
@@ -26,6 +26,55 @@ function logToFile(message) {
 
 let audioProcess = null;
 let videoProcess = null;
+let lipsyncProcess = null;
+
+// Prefer the locally decoded PCM copy (voices/.cache/<name>.wav) of a compressed TTS file
+function resolveAudioPath(fileName) {
+    const decodedPath = path.join(__dirname, 'voices', '.cache', `${path.parse(fileName).name}.wav`);
+    if (fs.existsSync(decodedPath)) {
+        return decodedPath;
+    }
+    return path.join(__dirname, 'voices', fileName);
+}
+
+// Lip-sync output for TTS responses: 'dry-run', 'servo' or 'led' (unset = disabled)
+const LIPSYNC_SINK = process.env.DROID_LIPSYNC_SINK;
+const LIPSYNC_GPIO = process.env.DROID_LIPSYNC_GPIO || '18';
+// Seconds from spawning mplayer to audible sound (player startup + output buffering)
+const LIPSYNC_OFFSET = process.env.DROID_LIPSYNC_OFFSET || '0.15';
+
+// Start lipsync.py against a playback start taken from the monotonic clock
+function startLipsync(timingFile, startNs) {
+    if (!LIPSYNC_SINK || !timingFile) {
+        return;
+    }
+    stopLipsync();
+
+    const timingPath = path.join(__dirname, 'voices', timingFile);
+    const proc = spawn('/home/pi/Droid/venv/bin/python3', [
+        path.join(__dirname, 'lipsync.py'), timingPath,
+        '--sink', LIPSYNC_SINK, '--gpio', LIPSYNC_GPIO, '--start-ns', startNs.toString(), '--offset', LIPSYNC_OFFSET
+    ]);
+    lipsyncProcess = proc;
+
+    proc.stdout.on('data', (data) => {
+        console.log(`Lipsync: ${data}`);
+    });
+
+    proc.on('close', () => {
+        // A replaced process closes after its successor has started; leave that one tracked
+        if (lipsyncProcess === proc) {
+            lipsyncProcess = null;
+        }
+    });
+}
+
+function stopLipsync() {
+    if (lipsyncProcess) {
+        lipsyncProcess.kill();
+        lipsyncProcess = null;
+    }
+}
 
 // Set up Multer storage for audio uploads
 const audioStorage = multer.diskStorage({
@@ -75,15 +124,15 @@ const videoUpload = multer({
 // Serve the static HTML frontend
 app.use(express.static('public'));
 
-// Endpoint to list audio (.wav) files in the 'voices' directory
+// Endpoint to list audio (.wav, .mp3, .opus) files in the 'voices' directory
 app.get('/files', (req, res) => {
     const voicesDir = path.join(__dirname, 'voices');
     fs.readdir(voicesDir, (err, files) => {
         if (err) {
             return res.status(500).send('Error reading voices directory');
         }
-        const wavFiles = files.filter(file => path.extname(file) === '.wav');
-        res.json(wavFiles);
+        const audioFiles = files.filter(file => ['.wav', '.mp3', '.opus'].includes(path.extname(file)));
+        res.json(audioFiles);
     });
 });
 
@@ -102,7 +151,7 @@ app.get('/videos', (req, res) => {
 // Endpoint to play audio (using mplayer)
 app.post('/play', (req, res) => {
     const fileName = req.query.file;
-    const filePath = path.join(__dirname, 'voices', fileName);
+    const filePath = resolveAudioPath(fileName);
 
     if (audioProcess) {
         return res.status(400).send('An audio process is already running. Please stop it first.');
@@ -125,6 +174,7 @@ app.post('/stopAudio', (req, res) => {
     if (audioProcess) {
         audioProcess.kill();
         audioProcess = null;
+        stopLipsync();
         console.log('Audio process stopped.');
         res.send('Stopped audio process');
     } else {
@@ -402,7 +452,8 @@ app.post('/tts/respond', (req, res) => {
                 const jsonStr = dataBuffer.substring(jsonStart, jsonEnd + 1);
                 const result = JSON.parse(jsonStr);
                 if (result.success) {
-                    // Automatically play the audio
+                    // Automatically play the audio (mplayer decodes compressed formats itself;
+                    // the background-decoded WAV serves later replays through /play)
                     const fileName = result.file;
                     const filePath = path.join(__dirname, 'voices', fileName);
 
@@ -412,6 +463,7 @@ app.post('/tts/respond', (req, res) => {
                     }
 
                     audioProcess = spawn('mplayer', [filePath]);
+                    startLipsync(result.timing_file, process.hrtime.bigint());
                     console.log(`Playing conversational response: ${fileName}`);
 
                     audioProcess.on('close', (code) => {